@@ -17,50 +17,110 @@
 
 '''
 
+import asyncio
 import json
 import os
-import warnings
-warnings.filterwarnings("ignore", category=DeprecationWarning) # shut it bs4
-from bs4 import BeautifulSoup
-import requests
+import random
+import sys
+import aiofiles
+import aiohttp
+from selectolax.lexbor import LexborHTMLParser
 headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/137.0.0.0 Safari/537.36"}
 
-def e(url, depth=3):
-    if depth < 0:
-        print("I give up")
-        os._exit(0)
-    elif depth < 3:
-        print(f"We failed {3-depth} times")
-        print("Retrying")
+async def fetch_meta(session, sem, url, tries=4):
+    delay = 0
+    for attempt in range(tries):
+        if attempt:
+            print("Retrying")
+            await asyncio.sleep(delay)
+        body = None
+        retry_after = None
+        try:
+            async with sem, session.get(url) as j:
+                if j.status == 200:
+                    body = await j.read()
+                elif j.status == 429:
+                    retry_after = j.headers.get("Retry-After")
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            # dropped connections are what rate limiting looks like too
+            pass
+        if body is not None:
+            break
+        print(f"We failed {attempt+1} times")
+        delay = min(30, 1.0 * 2**attempt * (1 + random.random()*0.5))
+        # a 429 tells us how long miraheze wants us to back off for
+        if retry_after is not None and retry_after.isdigit():
+            delay = max(delay, int(retry_after))
     else:
-        pass
-    # miraheze gets angry when useragent is bad
-    j = requests.get(url, headers=headers)
-    if j.status_code != 200:
-        return e(url,depth-1)
-    soup = BeautifulSoup(j.text, features="html.parser")
-    author=soup.find("td", id="fileinfotpl_aut").find_next_sibling("td").get_text(strip=True)
-    file=soup.find("div", id="file").findChildren()[0].get("href")
-    return [file, author]
-    
+        raise RuntimeError(f"I give up on {url}")
+    tree = LexborHTMLParser(body)
+    author=tree.css_first("td#fileinfotpl_aut + td").text(deep=True, strip=True)
+    file=tree.css_first("div#file a").attributes.get("href")
+    return (file, author)
+
 
-def main(): 
+async def fetch_file(session, sem, url, path):
+    async with sem, session.get(url) as j:
+        j.raise_for_status()
+        # write to a temporary name so an interrupted download isn't mistaken for a finished one
+        try:
+            async with aiofiles.open(path + ".part", "wb") as q:
+                async for chunk in j.content.iter_chunked(65536):
+                    await q.write(chunk)
+        except BaseException:
+            # includes cancellation, don't leave half a model lying around
+            if os.path.exists(path + ".part"):
+                os.remove(path + ".part")
+            raise
+    os.replace(path + ".part", path)
+
+
+async def main(refresh=False): 
     try:
         os.mkdir("../media/models")
     except Exception as qa:
         pass
     with open("../media/models/modellist.json", "r") as f:
         out = json.load(f)
-    contributors = []
+    # pages we already scraped on a previous run, these never expire on their own
+    # so pass --refresh (or delete modelmeta.json) to pick up changes on the wiki
+    meta_path = "../media/models/modelmeta.json"
+    meta = {}
+    if not refresh:
+        try:
+            with open(meta_path, "r") as f:
+                meta = {url: tuple(z) for url, z in json.load(f).items()}
+        except FileNotFoundError:
+            pass
+    # miraheze also gets angry when we open too many connections at once
+    sem = asyncio.Semaphore(10)
+    connector = aiohttp.TCPConnector(limit=64, limit_per_host=10, keepalive_timeout=30, ttl_dns_cache=300)
+    # miraheze gets angry when useragent is bad
+    async with aiohttp.ClientSession(headers=headers, connector=connector) as session:
+        # several models can point at the same wiki page, only scrape it once
+        urls = [url for url in dict.fromkeys(i[0] for i in out) if url not in meta]
+        results = await asyncio.gather(*[fetch_meta(session, sem, url) for url in urls], return_exceptions=True)
+        errors = []
+        for url, z in zip(urls, results):
+            if isinstance(z, BaseException):
+                errors.append(z)
+            else:
+                meta[url] = z
+        # save what we did get so a partial failure doesn't throw it all away
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=4)
+        if errors:
+            raise errors[0]
+        tasks = []
+        for i in out:
+            target = "../media/models/" + i[1] + ".off"
+            if os.path.exists(target):
+                continue
+            tasks.append(fetch_file(session, sem, "https:"+meta[i[0]][0], target))
+        await asyncio.gather(*tasks)
+    contributors = set()
     for i in out:
-        z = e(i[0])
-        if z[1] not in contributors:
-            contributors.append(z[1])
-
-        with open("../media/models/" + i[1] + ".off", "w") as q:
-            j = requests.get("https:"+z[0], headers=headers)
-            j.raise_for_status()
-            q.write(j.text)
+        contributors.add(meta[i[0]][1])
     contrib_path = "../media/models/CONTRIBUTIONS.md"
     with open(contrib_path, "w", encoding="utf-8") as f:
         f.write("# Contributors\n\n")
@@ -71,4 +131,4 @@ def main():
         
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main(refresh="--refresh" in sys.argv))
@@ -1661,7 +1661,11 @@ Vec3 multiply_vec3(Vec3 a, float scalar)
 
 Vec3 subtract_vec3(Vec3 a, Vec3 b)
 {
-    return add_vec3(a, multiply_vec3(b, -1.0f));
+    Vec3 result;
+    result.x = a.x - b.x;
+    result.y = a.y - b.y;
+    result.z = a.z - b.z;
+    return result;
 }
 
 /**
@@ -1685,7 +1689,22 @@ Vec3 lerp_vec3(Vec3 a, Vec3 b, float t)
 
 float magnitude_vec3(Vec3 a)
 {
-    return sqrt(a.x*a.x + a.y*a.y + a.z*a.z);
+    return sqrtf(a.x*a.x + a.y*a.y + a.z*a.z);
+}
+
+/**
+ * @brief This is the squared distance between two points
+ * @param a the first one
+ * @param b The second one
+ * @return The squared distance
+ */
+
+float dist_squared_vec3(Vec3 a, Vec3 b)
+{
+    float dx = a.x - b.x;
+    float dy = a.y - b.y;
+    float dz = a.z - b.z;
+    return dx*dx + dy*dy + dz*dz;
 }
 
 /**
@@ -1697,7 +1716,7 @@ float magnitude_vec3(Vec3 a)
 
 float dist_vec3(Vec3 a, Vec3 b)
 {
-    return magnitude_vec3(subtract_vec3(a, b));
+    return sqrtf(dist_squared_vec3(a, b));
 } 
 
 /**
@@ -1709,7 +1728,8 @@ float dist_vec3(Vec3 a, Vec3 b)
 
 bool equal_vec3(Vec3 a, Vec3 b)
 {
-    return fabs(dist_vec3(a, b)) < EPSILON;
+    // compare squared distances so we skip the sqrt
+    return dist_squared_vec3(a, b) < EPSILON * EPSILON;
 } 
 
 /**